@@ -0,0 +1,167 @@
+"""
+Hot-drink analytics over the `/substitute` request log.
+Run with: python -m backend.app.analytics --top 20 --window-hours 24
+
+Prints the top-N requested drinks, the cache miss rate and heavy hitters
+so ops can pre-warm substitutions for the names that matter.
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import time
+from pathlib import Path
+
+from .config import get_settings
+
+
+class CountMinSketch:
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.table = [[0] * width for _ in range(depth)]
+
+    def _indexes(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8 * self.depth).digest()
+        for row in range(self.depth):
+            yield row, int.from_bytes(digest[row * 8:(row + 1) * 8], "little") % self.width
+
+    def add(self, key: str, count: int = 1) -> None:
+        for row, col in self._indexes(key):
+            self.table[row][col] += count
+
+    def estimate(self, key: str) -> int:
+        return min(self.table[row][col] for row, col in self._indexes(key))
+
+
+class SlidingCountMinSketch:
+    """Count-min sketch over a sliding time window, kept as a ring of
+    per-slice sketches. Slices older than the window are dropped as time advances."""
+
+    def __init__(self, window_seconds: float, slices: int = 24, width: int = 2048, depth: int = 4):
+        self.slice_seconds = window_seconds / slices
+        self.slices = slices
+        self.width = width
+        self.depth = depth
+        self._ring: dict[int, CountMinSketch] = {}
+
+    def _expire(self, current_slice: int) -> None:
+        for slice_id in [s for s in self._ring if s <= current_slice - self.slices]:
+            del self._ring[slice_id]
+
+    def add(self, key: str, ts: float) -> None:
+        slice_id = int(ts // self.slice_seconds)
+        self._expire(slice_id)
+        if slice_id <= max(self._ring, default=slice_id) - self.slices:
+            return  # older than the window
+        sketch = self._ring.setdefault(slice_id, CountMinSketch(self.width, self.depth))
+        sketch.add(key)
+
+    def estimate(self, key: str) -> int:
+        return sum(sketch.estimate(key) for sketch in self._ring.values())
+
+
+EVENT_FIELDS = ("ts", "drink", "hit")
+
+
+def read_events(path: Path, since: float, stats: dict):
+    """Yield events newer than `since`; malformed lines or Parquet parts are skipped and counted in stats["malformed"]."""
+    if path.suffix == ".parquet":
+        import pandas as pd
+
+        if not path.exists():
+            return
+        for part in sorted(path.glob("*.parquet")):
+            try:
+                events = pd.read_parquet(part, columns=list(EVENT_FIELDS)).to_dict("records")
+            except Exception as e:
+                print(f"⚠️ Skipping unreadable log part {part.name}: {e}")
+                stats["malformed"] += 1
+                continue
+            for event in events:
+                if event["ts"] >= since:
+                    yield event
+        return
+    if not path.exists():
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            # Truncated tails (killed writer) or interleaved lines from several workers
+            try:
+                event = json.loads(line)
+                valid = isinstance(event, dict) and all(field in event for field in EVENT_FIELDS)
+                recent = valid and event["ts"] >= since
+            except (json.JSONDecodeError, TypeError):
+                valid = False
+            if not valid:
+                stats["malformed"] += 1
+                continue
+            if recent:
+                yield event
+
+
+def analyze(path: Path, window_hours: float, top_n: int, heavy_fraction: float) -> dict:
+    now = time.time()
+    window = window_hours * 3600
+    sketch = SlidingCountMinSketch(window)
+    # Only a bounded set of candidate names is tracked; counts come from the sketch
+    capacity = max(top_n * 10, 1000)
+    candidates: dict[str, int] = {}
+    requests = misses = 0
+    stats = {"malformed": 0}
+
+    for event in read_events(path, since=now - window, stats=stats):
+        name = event["drink"]
+        sketch.add(name, event["ts"])
+        candidates[name] = sketch.estimate(name)
+        if len(candidates) > 2 * capacity:
+            candidates = dict(heapq.nlargest(capacity, candidates.items(), key=lambda item: item[1]))
+        requests += 1
+        if not event["hit"]:
+            misses += 1
+
+    estimates = {name: sketch.estimate(name) for name in candidates}
+    top = heapq.nlargest(top_n, estimates.items(), key=lambda item: item[1])
+    threshold = heavy_fraction * requests
+    heavy = sorted(
+        ((name, count) for name, count in estimates.items() if count >= threshold),
+        key=lambda item: -item[1],
+    )
+    return {
+        "requests": requests,
+        "miss_rate": misses / requests if requests else 0.0,
+        "top": top,
+        "heavy_hitters": heavy,
+        "malformed_lines": stats["malformed"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot-drink analytics from the request log")
+    parser.add_argument("--path", default=get_settings().request_log_path)
+    parser.add_argument("--window-hours", type=float, default=24.0)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--heavy-fraction", type=float, default=0.01, help="share of requests to count as a heavy hitter")
+    parser.add_argument("--json", action="store_true", help="print machine-readable output for cache warming")
+    args = parser.parse_args()
+
+    report = analyze(Path(args.path), args.window_hours, args.top, args.heavy_fraction)
+    if args.json:
+        print(json.dumps(report))
+        return
+
+    print(f"📊 {report['requests']} requests in the last {args.window_hours:g}h, miss rate {report['miss_rate']:.1%}")
+    if report["malformed_lines"]:
+        print(f"⚠️ Skipped {report['malformed_lines']} malformed log lines or parts")
+    print(f"\nTop {args.top} drinks:")
+    for name, count in report["top"]:
+        print(f"   {count:>6}  {name}")
+    print(f"\nHeavy hitters (≥{args.heavy_fraction:.1%} of requests):")
+    for name, count in report["heavy_hitters"]:
+        print(f"   {count:>6}  {name}")
+
+
+if __name__ == "__main__":
+    main()
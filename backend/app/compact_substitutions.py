@@ -0,0 +1,102 @@
+"""
+Move superseded substitutions into `substitutions_archive`.
+Run with: python -m backend.app.compact_substitutions [--min-age-days 7] [--batch-size 1000]
+
+Every drink keeps its current substitution (`drinks.current_substitution_id`)
+in the hot table; older rows are copied to the archive and deleted in batches.
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from . import models
+
+ARCHIVED_COLUMNS = [
+    "id",
+    "original_drink_id",
+    "substitute_drink_id",
+    "substitute_name",
+    "substitute_notes",
+    "sugar_delta",
+    "caffeine_delta",
+    "source",
+    "created_at",
+]
+
+
+def backfill_current_pointers(db: Session) -> int:
+    """Point drinks without a current_substitution_id at their latest substitution."""
+    S = models.Substitution
+    latest = (
+        select(S.id)
+        .where(S.original_drink_id == models.Drink.id)
+        .order_by(S.created_at.desc(), S.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    result = db.execute(
+        update(models.Drink)
+        .where(models.Drink.current_substitution_id.is_(None))
+        .where(select(S.id).where(S.original_drink_id == models.Drink.id).exists())
+        .values(current_substitution_id=latest)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def archive_superseded(db: Session, min_age: timedelta, batch_size: int) -> int:
+    S = models.Substitution
+    cutoff = datetime.now(timezone.utc) - min_age
+    archived = 0
+    while True:
+        # Only drinks with a current pointer are compacted, so a drink never loses its latest row
+        ids = db.scalars(
+            select(S.id)
+            .join(models.Drink, models.Drink.id == S.original_drink_id)
+            .where(models.Drink.current_substitution_id.is_not(None))
+            .where(S.id != models.Drink.current_substitution_id)
+            .where(S.created_at < cutoff)
+            .order_by(S.id)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            return archived
+
+        columns = [getattr(S, name) for name in ARCHIVED_COLUMNS]
+        db.execute(
+            insert(models.SubstitutionArchive).from_select(
+                ARCHIVED_COLUMNS, select(*columns).where(S.id.in_(ids))
+            )
+        )
+        db.execute(delete(S).where(S.id.in_(ids)).execution_options(synchronize_session=False))
+        db.commit()
+        archived += len(ids)
+        print(f"   archived {archived} rows so far")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive superseded substitutions")
+    parser.add_argument("--min-age-days", type=float, default=7.0)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    db: Session = SessionLocal(info={"use_primary": True})
+    try:
+        backfilled = backfill_current_pointers(db)
+        print(f"✅ Backfilled current substitution for {backfilled} drinks")
+        archived = archive_superseded(db, timedelta(days=args.min_age_days), args.batch_size)
+        print(f"✅ Archived {archived} superseded substitutions")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Compaction failed: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
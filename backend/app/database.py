@@ -1,19 +1,123 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import itertools
+import threading
+import time
+
+from sqlalchemy import create_engine, event, Delete, Insert, Update
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 
 from .config import get_settings
 
 settings = get_settings()
 
 engine = create_engine(settings.database_url, echo=False, future=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+replica_engines = [
+    create_engine(url, echo=False, future=True, pool_pre_ping=True)
+    for url in settings.replica_urls
+]
 Base = declarative_base()
 
 
+class ReplicaPool:
+    """Round-robin over replica engines, skipping ones that recently failed."""
+
+    def __init__(self, engines, cooldown: float = 30.0):
+        self.engines = engines
+        self.cooldown = cooldown
+        self._down_until: dict[int, float] = {}
+        self._cycle = itertools.cycle(range(len(engines)))
+        self._lock = threading.Lock()
+
+    def choose(self):
+        now = time.monotonic()
+        with self._lock:
+            for _ in range(len(self.engines)):
+                index = next(self._cycle)
+                if self._down_until.get(index, 0) <= now:
+                    return self.engines[index]
+        return None
+
+    def mark_down(self, replica) -> None:
+        with self._lock:
+            self._down_until[self.engines.index(replica)] = time.monotonic() + self.cooldown
+
+
+replicas = ReplicaPool(replica_engines)
+
+
+class RoutingSession(Session):
+    """Sends reads to one replica, picked once per session so all of a request's
+    reads see the same snapshot, and everything else to the primary. Once the
+    session has written, it stays on the primary so its own writes are visible.
+    A read that fails on an unreachable replica is retried on the primary."""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            not replica_engines
+            or self._flushing
+            or self.info.get("use_primary")
+            or isinstance(clause, (Insert, Update, Delete))
+        ):
+            bind = engine
+        else:
+            bind = self.info.get("replica")
+            if bind is None:
+                bind = replicas.choose() or engine
+                self.info["replica"] = bind
+        self.info["last_bind"] = bind
+        return bind
+
+    def _with_replica_fallback(self, run):
+        try:
+            return run()
+        except DBAPIError as e:
+            replica = self.info.get("replica")
+            failed_on_replica = replica is not None and replica is not engine and self.info.get("last_bind") is replica
+            unreachable = e.connection_invalidated or isinstance(e, OperationalError)
+            # Only safe to replay when the session holds no unflushed changes
+            if not (failed_on_replica and unreachable) or self.new or self.dirty or self.deleted:
+                raise
+            print(f"⚠️ Read replica {replica.url.host or replica.url.database} failed ({type(e.orig).__name__}), retrying on primary")
+            replicas.mark_down(replica)
+            self.rollback()
+            self.info.pop("replica", None)
+            self.info["use_primary"] = True
+            return run()
+
+    def execute(self, *args, **kw):
+        return self._with_replica_fallback(lambda: super(RoutingSession, self).execute(*args, **kw))
+
+    def scalars(self, *args, **kw):
+        return self._with_replica_fallback(lambda: super(RoutingSession, self).scalars(*args, **kw))
+
+    def scalar(self, *args, **kw):
+        return self._with_replica_fallback(lambda: super(RoutingSession, self).scalar(*args, **kw))
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _stick_to_primary(session, flush_context):
+    session.info["use_primary"] = True
+
+
+def use_primary(session: Session) -> bool:
+    """Send the session's remaining queries to the primary, e.g. before a
+    read that decides a write. Returns True if it had been reading from a
+    replica; objects loaded from it are expired so they reload from the primary."""
+    session.info["use_primary"] = True
+    replica = session.info.pop("replica", None)
+    if replica is None or replica is engine:
+        return False
+    if not (session.new or session.dirty or session.deleted):
+        session.expire_all()
+    return True
+
+
+SessionLocal = sessionmaker(class_=RoutingSession, autoflush=False, autocommit=False)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
-
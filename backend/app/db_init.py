@@ -1,12 +1,28 @@
+from sqlalchemy import text
+
 from .database import Base, engine
 from . import models
 
+# Idempotent changes for databases created before these columns/indexes existed;
+# create_all only creates missing tables. Replace with Alembic migrations later.
+UPGRADE_STATEMENTS = [
+    "ALTER TABLE drinks ADD COLUMN IF NOT EXISTS current_substitution_id INTEGER REFERENCES substitutions(id)",
+    "CREATE INDEX IF NOT EXISTS ix_substitutions_original_drink_id_created_at "
+    "ON substitutions (original_drink_id, created_at)",
+]
+
+
+def upgrade_schema():
+    with engine.begin() as conn:
+        for statement in UPGRADE_STATEMENTS:
+            conn.execute(text(statement))
+
 
 def main():
     Base.metadata.create_all(bind=engine)
+    upgrade_schema()
     print("✅ Database tables created")
 
 
 if __name__ == "__main__":
     main()
-
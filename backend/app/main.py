@@ -1,13 +1,60 @@
-from fastapi import FastAPI, Depends, HTTPException
+import hashlib
+
+import orjson
+from fastapi import FastAPI, Depends, HTTPException, Request, Response
 
 from . import schemas, models
+from .config import get_settings
 from .database import get_db, Base, engine
+from .services.ranking import candidate_index
 from .services.substitution import get_or_create_substitution
 
-# Create tables on startup; later replace with Alembic migrations
+# Create tables on startup; later replace with Alembic migrations.
+# Column/index upgrades run only via `python -m backend.app.db_init` (they take table locks).
 Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="SweetSwap AI")
+settings = get_settings()
+
+
+# Substitution rows are never modified once written, so an id lookup is immutable.
+# Name lookups can move to a newer row after regeneration and get a short max-age.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+NAME_LOOKUP_CACHE_CONTROL = "public, max-age=300"
+
+
+def substitution_etag(substitution_id: int, created_at) -> str:
+    digest = hashlib.sha1(f"{substitution_id}:{created_at.isoformat()}".encode("utf-8")).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def render(response: Response, result, headers: dict | None = None):
+    """With FAST_RESPONSES, encode the SubstitutionRow straight to JSON bytes with orjson,
+    skipping FastAPI's response_model validation; otherwise return it as before."""
+    if settings.fast_responses:
+        return Response(orjson.dumps(result, option=orjson.OPT_UTC_Z), media_type="application/json", headers=headers)
+    response.headers.update(headers or {})
+    return result
+
+
+def cached_response(request: Request, response: Response, result, cache_control: str):
+    """Attach caching headers to the result, or return a bare 304 if the client already has it."""
+    if not result.persisted:
+        # Transient fallback: must not be cached so it is regenerated later
+        return render(response, result, {"Cache-Control": "no-store"})
+    etag = substitution_etag(result.id, result.created_at)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return render(response, result, headers)
 
 
 @app.get("/health")
@@ -18,15 +65,45 @@ def healthcheck():
 @app.post("/substitute", response_model=schemas.Substitution)
 def request_substitute(
     payload: schemas.SubstituteRequest,
+    request: Request,
+    response: Response,
+    db=Depends(get_db),
+):
+    client_id = request.client.host if request.client else None
+    result = get_or_create_substitution(db, payload, client_id=client_id, fast=settings.fast_responses)
+    return render(response, result)
+
+
+@app.get("/substitute", response_model=schemas.Substitution)
+def lookup_substitute(
+    request: Request,
+    response: Response,
+    drink_name: str,
+    include_nutrition: bool = True,
     db=Depends(get_db),
 ):
-    return get_or_create_substitution(db, payload)
+    """Cacheable GET variant of POST /substitute for CDNs, proxies and the frontend."""
+    payload = schemas.SubstituteRequest(drink_name=drink_name, include_nutrition=include_nutrition)
+    client_id = request.client.host if request.client else None
+    result = get_or_create_substitution(db, payload, client_id=client_id, fast=settings.fast_responses)
+    return cached_response(request, response, result, NAME_LOOKUP_CACHE_CONTROL)
+
+
+@app.post("/substitute/search", response_model=list[schemas.RankedSubstitute])
+def search_substitutes(payload: schemas.SubstituteSearchRequest, db=Depends(get_db)):
+    return candidate_index.search(db, payload)
 
 
 @app.get("/substitute/{drink_id}", response_model=schemas.Substitution)
-def get_substitute(drink_id: int, db=Depends(get_db)):
+def get_substitute(drink_id: int, request: Request, response: Response, db=Depends(get_db)):
     record = db.query(models.Substitution).filter(models.Substitution.id == drink_id).first()
     if not record:
         raise HTTPException(status_code=404, detail="Substitution not found")
-    return schemas.Substitution.from_orm(record)
+    etag = substitution_etag(record.id, record.created_at)
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if etag_matches(request, etag):
+        # Skip loading the original drink and serializing the body
+        return Response(status_code=304, headers=headers)
+    serializer = schemas.SubstitutionRow if settings.fast_responses else schemas.Substitution
+    return render(response, serializer.from_orm(record), headers)
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import relationship
 
 from .database import Base
@@ -15,6 +15,12 @@ class Drink(Base):
     caffeine_content = Column(Float, nullable=True)
     flavor_profile = Column(String, nullable=True)
     source = Column(String, default="seed")
+    # Latest substitution for this drink, kept in sync on write for O(1) lookup
+    current_substitution_id = Column(
+        Integer,
+        ForeignKey("substitutions.id", use_alter=True, name="fk_drinks_current_substitution_id"),
+        nullable=True,
+    )
 
     substitutions = relationship(
         "Substitution",
@@ -25,6 +31,9 @@ class Drink(Base):
 
 class Substitution(Base):
     __tablename__ = "substitutions"
+    __table_args__ = (
+        Index("ix_substitutions_original_drink_id_created_at", "original_drink_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     original_drink_id = Column(Integer, ForeignKey("drinks.id"), nullable=False)
@@ -47,3 +56,19 @@ class Substitution(Base):
         lazy="joined",
     )
 
+
+class SubstitutionArchive(Base):
+    """Superseded substitutions moved out of the hot table by compact_substitutions."""
+
+    __tablename__ = "substitutions_archive"
+
+    id = Column(Integer, primary_key=True)
+    original_drink_id = Column(Integer, nullable=False, index=True)
+    substitute_drink_id = Column(Integer, nullable=True)
+    substitute_name = Column(String, nullable=False)
+    substitute_notes = Column(String, nullable=True)
+    sugar_delta = Column(Float, nullable=True)
+    caffeine_delta = Column(Float, nullable=True)
+    source = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
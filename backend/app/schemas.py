@@ -1,5 +1,6 @@
+from dataclasses import dataclass
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class DrinkBase(BaseModel):
@@ -33,13 +34,28 @@ class SubstituteRequest(BaseModel):
     include_nutrition: bool = True
 
 
+class SubstituteSearchRequest(BaseModel):
+    max_sugar: float | None = 10.0  # grams per serving
+    max_caffeine: float | None = None  # mg per serving
+    caffeine_free: bool = False
+    flavors: list[str] = []
+    category: str | None = None
+    exclude: list[str] = []  # drink names to leave out, e.g. the original drink
+    top_k: int = Field(default=5, ge=1, le=100)
+
+
+class RankedSubstitute(Drink):
+    score: float
+
+
 class Substitution(SubstitutionBase):
-    id: int
+    id: int | None = None  # None for transient fallbacks that were not stored
     original_drink_name: str
     sugar_delta: float | None = None
     caffeine_delta: float | None = None
     source: str | None = None
     created_at: datetime
+    persisted: bool = True
 
     class Config:
         from_attributes = True  # Pydantic v2 syntax
@@ -61,3 +77,31 @@ class Substitution(SubstitutionBase):
         }
         return cls(**data)
 
+
+@dataclass(slots=True)
+class SubstitutionRow:
+    """Unvalidated mirror of `Substitution` for the opt-in fast response path.
+    Only built from trusted DB rows; orjson serializes it natively."""
+
+    substitute_name: str
+    original_drink_name: str
+    created_at: datetime
+    substitute_notes: str | None = None
+    id: int | None = None
+    sugar_delta: float | None = None
+    caffeine_delta: float | None = None
+    source: str | None = None
+    persisted: bool = True
+
+    @classmethod
+    def from_orm(cls, obj):
+        return cls(
+            id=obj.id,
+            substitute_name=obj.substitute_name,
+            substitute_notes=obj.substitute_notes,
+            original_drink_name=obj.original_drink.name if obj.original_drink else "Unknown",
+            sugar_delta=obj.sugar_delta,
+            caffeine_delta=obj.caffeine_delta,
+            source=obj.source,
+            created_at=obj.created_at,
+        )
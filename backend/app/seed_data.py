@@ -70,7 +70,7 @@ def load_seed_data():
         print(f"❌ CSV file not found: {csv_path}")
         return
     
-    db: Session = SessionLocal()
+    db: Session = SessionLocal(info={"use_primary": True})
     try:
         with open(csv_path, "r", encoding="utf-8") as f:
             reader = csv.DictReader(f)
@@ -137,6 +137,8 @@ def load_seed_data():
                         source=row.get("source", "manual"),
                     )
                     db.add(substitution)
+                    db.flush()
+                    original_drink.current_substitution_id = substitution.id
                     count += 1
             
             db.commit()
@@ -3,31 +3,66 @@ import json
 import google.generativeai as genai
 
 from ..config import get_settings
+from .rate_limit import get_admission_controller
 
 
-def generate_substitution(drink_name: str, nutrition: dict | None = None) -> dict:
+def fallback_substitution(drink_name: str, nutrition: dict | None = None, persist: bool = True) -> dict:
+    """Generic low-sugar suggestion used when Gemini is unavailable.
+    `persist=False` marks transient failures so the result is not stored and
+    the drink gets regenerated on a later request."""
+    return {
+        "name": f"Unsweetened {drink_name}",
+        "notes": f"Lower sugar alternative for {drink_name}. Consider using sugar-free sweeteners or unsweetened bases.",
+        "sugar_delta": -20.0 if nutrition else None,
+        "caffeine_delta": None,
+        "persist": persist,
+    }
+
+
+def generate_substitution(
+    drink_name: str,
+    nutrition: dict | None = None,
+    client_id: str | None = None,
+) -> dict:
     """
     Generate a diabetes-friendly substitution using Gemini API.
-    Returns dict with: name, notes, sugar_delta, caffeine_delta
+    Returns dict with: name, notes, sugar_delta, caffeine_delta, persist
     """
     settings = get_settings()
     api_key = settings.gemini_api_key
     
     if not api_key:
         # Fallback if no API key
-        return {
-            "name": f"Unsweetened {drink_name}",
-            "notes": f"Lower sugar alternative for {drink_name}. Consider using sugar-free sweeteners or unsweetened bases.",
-            "sugar_delta": -20.0 if nutrition else None,
-            "caffeine_delta": None,
-        }
-    
+        return fallback_substitution(drink_name, nutrition)
+
+    if not get_admission_controller().admit(client_id):
+        print(f"⚠️ LLM admission denied for '{drink_name}' (client={client_id}), shedding load")
+        return fallback_substitution(drink_name, nutrition, persist=False)
+
+    # Imported here because llm_worker imports call_gemini from this module
+    from .llm_worker import run_generation
+
+    return run_generation(drink_name, nutrition)
+
+
+def call_gemini(drink_name: str, nutrition: dict | None = None) -> dict:
+    """
+    Prompt Gemini and parse its JSON answer. Runs on the generation side
+    (inline, in a pool process or in a Redis queue consumer).
+    """
+    settings = get_settings()
+    api_key = settings.gemini_api_key
+    if not api_key:
+        return fallback_substitution(drink_name, nutrition)
+    # Bound every SDK call so a hung request can't pin a worker forever
+    request_options = {"timeout": settings.llm_request_timeout}
+
     try:
         genai.configure(api_key=api_key)
         
         # Try to get available models first
         try:
-            models_list = genai.list_models()
+            models_list = genai.list_models(request_options=request_options)
             available_models = []
             for m in models_list:
                 if hasattr(m, 'supported_generation_methods') and 'generateContent' in m.supported_generation_methods:
@@ -105,7 +140,7 @@ Example response:
 
 Now provide the substitution for "{drink_name}":"""
 
-        response = model.generate_content(prompt)
+        response = model.generate_content(prompt, request_options=request_options)
         response_text = response.text.strip()
         
         # Try to extract JSON from response (sometimes Gemini wraps it in markdown)
@@ -122,25 +157,16 @@ Now provide the substitution for "{drink_name}":"""
             "notes": result.get("notes", "Diabetes-friendly alternative"),
             "sugar_delta": float(result.get("sugar_delta", -20.0)) if result.get("sugar_delta") is not None else None,
             "caffeine_delta": float(result.get("caffeine_delta", 0.0)) if result.get("caffeine_delta") is not None else None,
+            "persist": True,
         }
     
     except json.JSONDecodeError as e:
         print(f"⚠️ Failed to parse Gemini JSON response: {e}")
-        # Fallback response
-        return {
-            "name": f"Unsweetened {drink_name}",
-            "notes": f"Lower sugar alternative for {drink_name}. Consider using sugar-free sweeteners or unsweetened bases.",
-            "sugar_delta": -20.0 if nutrition else None,
-            "caffeine_delta": None,
-        }
+        # Fallback response; not persisted so the drink is retried later
+        return fallback_substitution(drink_name, nutrition, persist=False)
     except Exception as e:
         print(f"⚠️ Gemini API error: {e}")
         print(f"   API Key present: {bool(api_key)}")
         print(f"   Error type: {type(e).__name__}")
-        # Fallback response
-        return {
-            "name": f"Unsweetened {drink_name}",
-            "notes": f"Lower sugar alternative for {drink_name}. Consider using sugar-free sweeteners or unsweetened bases.",
-            "sugar_delta": -20.0 if nutrition else None,
-            "caffeine_delta": None,
-        }
+        # Fallback response; not persisted so the drink is retried later
+        return fallback_substitution(drink_name, nutrition, persist=False)
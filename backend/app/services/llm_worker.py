@@ -0,0 +1,148 @@
+"""
+Generation tier for LLM work, decoupled from the API process.
+
+- "inline":  call Gemini in the API worker thread (previous behaviour)
+- "process": local ProcessPoolExecutor, recreated if a child crashes
+- "redis":   jobs pushed to a Redis list and consumed by `python -m backend.app.worker`
+
+The API side submits a job and waits up to `llm_job_timeout` seconds; on
+timeout or worker failure it gets a non-persistent fallback instead.
+"""
+import json
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from ..config import get_settings
+from .llm import call_gemini, fallback_substitution
+
+JOB_QUEUE_KEY = "sweetswap:llm:jobs"
+RESULT_KEY_PREFIX = "sweetswap:llm:result:"
+
+
+class InlineBackend:
+    def run(self, drink_name: str, nutrition: dict | None, timeout: float) -> dict:
+        return call_gemini(drink_name, nutrition)
+
+
+class ProcessPoolBackend:
+    def __init__(self, processes: int, max_tasks_per_child: int = 100):
+        self.processes = processes
+        self.max_tasks_per_child = max_tasks_per_child
+        self._lock = threading.Lock()
+        self._consecutive_timeouts = 0
+        self._pool = self._new_pool()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # spawn rather than fork: the API process is multi-threaded
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            max_tasks_per_child=self.max_tasks_per_child,
+        )
+
+    def _restart(self, old: ProcessPoolExecutor, reason: str) -> None:
+        with self._lock:
+            if self._pool is old:
+                print(f"⚠️ Restarting LLM process pool: {reason}")
+                self._pool = self._new_pool()
+                self._consecutive_timeouts = 0
+                # Running jobs can't be cancelled; kill the children so hung SDK calls go away
+                for process in list((getattr(old, "_processes", None) or {}).values()):
+                    process.terminate()
+                old.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, drink_name: str, nutrition: dict | None, timeout: float) -> dict:
+        pool = self._pool
+        future = None
+        try:
+            future = pool.submit(call_gemini, drink_name, nutrition)
+            result = future.result(timeout=timeout)
+            with self._lock:
+                self._consecutive_timeouts = 0
+            return result
+        except FutureTimeoutError:
+            future.cancel()
+            print(f"⚠️ LLM job for '{drink_name}' timed out after {timeout}s")
+            with self._lock:
+                self._consecutive_timeouts += 1
+                timeouts = self._consecutive_timeouts
+            # Every worker is probably stuck on a hung call; recycle them
+            if timeouts >= self.processes:
+                self._restart(pool, f"{timeouts} consecutive timeouts")
+        except BrokenProcessPool:
+            self._restart(pool, "a worker process died")
+        except Exception as e:
+            print(f"⚠️ LLM worker job for '{drink_name}' failed: {type(e).__name__}: {e}")
+        return fallback_substitution(drink_name, nutrition, persist=False)
+
+
+class RedisQueueBackend:
+    def __init__(self, redis_url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(redis_url)
+
+    def run(self, drink_name: str, nutrition: dict | None, timeout: float) -> dict:
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "drink_name": drink_name,
+            "nutrition": nutrition,
+            # Consumers skip jobs nobody is waiting for anymore
+            "deadline": time.time() + timeout,
+        }
+        try:
+            self.client.lpush(JOB_QUEUE_KEY, json.dumps(job))
+            reply = self.client.blpop(RESULT_KEY_PREFIX + job_id, timeout=timeout)
+        except Exception as e:
+            print(f"⚠️ Redis LLM queue error: {e}")
+            reply = None
+        if reply is None:
+            print(f"⚠️ No LLM worker result for '{drink_name}' within {timeout}s")
+            return fallback_substitution(drink_name, nutrition, persist=False)
+        return json.loads(reply[1])
+
+
+def consume_jobs(redis_url: str, poll_timeout: int = 5) -> None:
+    """Blocking consumer loop run by each Redis queue worker process."""
+    import redis
+
+    client = redis.Redis.from_url(redis_url)
+    while True:
+        item = client.brpop(JOB_QUEUE_KEY, timeout=poll_timeout)
+        if item is None:
+            continue
+        job = json.loads(item[1])
+        if job.get("deadline", 0) < time.time():
+            continue
+        result = call_gemini(job["drink_name"], job.get("nutrition"))
+        result_key = RESULT_KEY_PREFIX + job["id"]
+        client.lpush(result_key, json.dumps(result))
+        client.expire(result_key, 60)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_generation_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                settings = get_settings()
+                if settings.llm_worker_backend == "redis":
+                    _backend = RedisQueueBackend(settings.redis_url)
+                elif settings.llm_worker_backend == "process":
+                    _backend = ProcessPoolBackend(settings.llm_worker_processes)
+                else:
+                    _backend = InlineBackend()
+    return _backend
+
+
+def run_generation(drink_name: str, nutrition: dict | None = None) -> dict:
+    return get_generation_backend().run(drink_name, nutrition, get_settings().llm_job_timeout)
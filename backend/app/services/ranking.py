@@ -0,0 +1,221 @@
+"""
+In-memory ranking of candidate substitutes for `POST /substitute/search`.
+
+Drinks are held as NumPy columns (sugar, caffeine, category codes) plus a
+one-hot flavor tag matrix, so filtering and scoring is a handful of vector
+operations instead of ORM queries. New drinks are appended incrementally;
+a periodic full rebuild picks up edits to existing rows.
+"""
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .. import models, schemas
+
+DRINK_FIELDS = ("id", "name", "category", "ingredients", "sugar_content", "caffeine_content", "flavor_profile", "source")
+
+INCREMENTAL_REFRESH_SECONDS = 5.0
+FULL_REBUILD_SECONDS = 600.0
+
+FLAVOR_WEIGHT = 0.6
+SUGAR_WEIGHT = 0.3
+CATEGORY_WEIGHT = 0.1
+
+
+def parse_flavor_tags(flavor_profile: str | None) -> list[str]:
+    if not flavor_profile:
+        return []
+    return [tag.strip().lower() for tag in flavor_profile.split(",") if tag.strip()]
+
+
+@dataclass(frozen=True)
+class FeatureMatrix:
+    ids: np.ndarray        # int64, one per drink
+    sugar: np.ndarray      # float64, NaN when unknown
+    caffeine: np.ndarray   # float64, NaN when unknown
+    category: np.ndarray   # int32 code into `categories`, -1 when unknown
+    flavors: np.ndarray    # bool, drinks x tags
+    categories: dict[str, int]
+    tags: dict[str, int]
+    names: np.ndarray      # lower-cased names, for exclusions
+    rows: tuple            # plain tuples of DRINK_FIELDS, turned into schemas only for the top-k
+
+    @property
+    def max_id(self) -> int:
+        return int(self.ids.max()) if len(self.ids) else 0
+
+
+EMPTY = FeatureMatrix(
+    ids=np.empty(0, dtype=np.int64),
+    sugar=np.empty(0),
+    caffeine=np.empty(0),
+    category=np.empty(0, dtype=np.int32),
+    flavors=np.zeros((0, 0), dtype=bool),
+    categories={},
+    tags={},
+    names=np.empty(0, dtype=object),
+    rows=(),
+)
+
+
+def load_drink_rows(db: Session, since_id: int = 0) -> list[tuple]:
+    """Plain column tuples (DRINK_FIELDS order) for drinks with id > since_id; no ORM entities."""
+    columns = [getattr(models.Drink, field) for field in DRINK_FIELDS]
+    query = db.query(*columns).filter(models.Drink.id > since_id).order_by(models.Drink.id)
+    return [tuple(row) for row in query]
+
+
+def extend_matrix(base: FeatureMatrix, rows: list[tuple]) -> FeatureMatrix:
+    """Return a new matrix with `rows` appended, growing the tag/category vocab as needed."""
+    if not rows:
+        return base
+    ids, names, category_names, _, sugar, caffeine, flavor_profiles, _ = zip(*rows)
+    categories = dict(base.categories)
+    tags = dict(base.tags)
+
+    # One-hot flavor tags via a single fancy-indexed assignment
+    offset = len(base.ids)
+    flavor_rows, flavor_cols = [], []
+    for position, profile in enumerate(flavor_profiles):
+        for tag in parse_flavor_tags(profile):
+            flavor_rows.append(offset + position)
+            flavor_cols.append(tags.setdefault(tag, len(tags)))
+    flavors = np.zeros((offset + len(rows), len(tags)), dtype=bool)
+    flavors[:offset, : base.flavors.shape[1]] = base.flavors
+    flavors[flavor_rows, flavor_cols] = True
+
+    category_codes = np.fromiter(
+        (categories.setdefault(name.lower(), len(categories)) if name else -1 for name in category_names),
+        dtype=np.int32,
+        count=len(rows),
+    )
+
+    return FeatureMatrix(
+        ids=np.concatenate([base.ids, np.fromiter(ids, dtype=np.int64, count=len(rows))]),
+        # None becomes NaN when converted to float64
+        sugar=np.concatenate([base.sugar, np.array(sugar, dtype=np.float64)]),
+        caffeine=np.concatenate([base.caffeine, np.array(caffeine, dtype=np.float64)]),
+        category=np.concatenate([base.category, category_codes]),
+        flavors=flavors,
+        categories=categories,
+        tags=tags,
+        names=np.concatenate([base.names, np.array([name.lower() for name in names], dtype=object)]),
+        rows=base.rows + tuple(rows),
+    )
+
+
+class CandidateIndex:
+    """Searches read `self.matrix` without locking. New drinks are appended by
+    whichever search finds the index stale; periodic full rebuilds run in a
+    background thread and are swapped in when done, so searches never wait on them."""
+
+    def __init__(self, session_factory=None):
+        self.matrix = EMPTY
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._built = False
+        self._rebuilding = False
+        self._last_incremental = 0.0
+        self._last_full = 0.0
+
+    def _new_session(self) -> Session:
+        if self._session_factory is None:
+            from ..database import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def _rebuild(self) -> None:
+        try:
+            db = self._new_session()
+            try:
+                matrix = extend_matrix(EMPTY, load_drink_rows(db))
+            finally:
+                db.close()
+            with self._lock:
+                # Drinks appended to the old matrix while we were building are
+                # picked up by the next incremental refresh (id > matrix.max_id)
+                self.matrix = matrix
+                self._built = True
+        except Exception as e:
+            print(f"⚠️ Candidate index rebuild failed: {e}")
+        finally:
+            self._last_full = time.monotonic()
+            self._rebuilding = False
+
+    def _start_rebuild(self) -> None:
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild, name="candidate-index-rebuild", daemon=True).start()
+
+    def refresh(self, db: Session) -> FeatureMatrix:
+        if not self._built:
+            # Cold start: nothing to serve yet, so the first build runs inline
+            with self._lock:
+                if not self._built:
+                    self.matrix = extend_matrix(EMPTY, load_drink_rows(db))
+                    self._built = True
+                    self._last_full = self._last_incremental = time.monotonic()
+            return self.matrix
+
+        now = time.monotonic()
+        if now - self._last_full >= FULL_REBUILD_SECONDS and not self._rebuilding:
+            self._start_rebuild()
+        if now - self._last_incremental >= INCREMENTAL_REFRESH_SECONDS and self._lock.acquire(blocking=False):
+            # Another thread refreshing or swapping in a rebuild: serve the current snapshot
+            try:
+                base = self.matrix
+                self.matrix = extend_matrix(base, load_drink_rows(db, since_id=base.max_id))
+                self._last_incremental = now
+            finally:
+                self._lock.release()
+        return self.matrix
+
+    def search(self, db: Session, request: schemas.SubstituteSearchRequest) -> list[schemas.RankedSubstitute]:
+        m = self.refresh(db)
+        if not len(m.ids):
+            return []
+
+        mask = np.ones(len(m.ids), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            if request.max_sugar is not None:
+                mask &= m.sugar <= request.max_sugar
+            max_caffeine = 0.0 if request.caffeine_free else request.max_caffeine
+            if max_caffeine is not None:
+                mask &= m.caffeine <= max_caffeine
+        if request.exclude:
+            mask &= ~np.isin(m.names, [name.lower() for name in request.exclude])
+
+        wanted = [m.tags[tag] for tag in {t.strip().lower() for t in request.flavors} if tag in m.tags]
+        if wanted:
+            flavor_score = m.flavors[:, wanted].sum(axis=1) / len(wanted)
+        else:
+            flavor_score = np.zeros(len(m.ids))
+
+        sugar_cap = request.max_sugar if request.max_sugar else np.nanmax(m.sugar, initial=1.0) or 1.0
+        sugar_score = 1.0 - np.clip(np.nan_to_num(m.sugar, nan=sugar_cap) / sugar_cap, 0.0, 1.0)
+
+        category_score = np.zeros(len(m.ids))
+        if request.category and request.category.lower() in m.categories:
+            category_score = (m.category == m.categories[request.category.lower()]).astype(np.float64)
+
+        score = FLAVOR_WEIGHT * flavor_score + SUGAR_WEIGHT * sugar_score + CATEGORY_WEIGHT * category_score
+        score = np.where(mask, score, -np.inf)
+
+        k = min(request.top_k, int(mask.sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-score, k - 1)[:k]
+        top = top[np.argsort(-score[top])]
+        return [
+            schemas.RankedSubstitute(**dict(zip(DRINK_FIELDS, m.rows[i])), score=round(float(score[i]), 4))
+            for i in top
+        ]
+
+
+candidate_index = CandidateIndex()
@@ -0,0 +1,226 @@
+"""
+Token-bucket admission control for outbound LLM calls.
+
+A global bucket caps total Gemini spend across the deployment and a per-client
+bucket stops a single caller from draining it. Buckets live in memory for a
+single worker or in Redis when several workers share the same budget.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from ..config import get_settings
+
+
+class TokenBucket:
+    """In-process token bucket. `try_acquire` returns 0.0 on success, otherwise
+    the number of seconds until a token becomes available."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def refund(self, tokens: float = 1.0) -> None:
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+
+class MemoryBucketStore:
+    """Holds the global bucket plus an LRU-bounded map of per-client buckets."""
+
+    def __init__(self, global_rate, global_burst, client_rate, client_burst, max_clients=10_000):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_clients = max_clients
+        self._clients: OrderedDict[str, TokenBucket] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def try_acquire_global(self) -> float:
+        return self.global_bucket.try_acquire()
+
+    def _client_bucket(self, client_id: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._clients.get(client_id)
+            if bucket is None:
+                bucket = TokenBucket(self.client_rate, self.client_burst)
+                self._clients[client_id] = bucket
+                if len(self._clients) > self.max_clients:
+                    self._clients.popitem(last=False)
+            else:
+                self._clients.move_to_end(client_id)
+        return bucket
+
+    def try_acquire_client(self, client_id: str) -> float:
+        return self._client_bucket(client_id).try_acquire()
+
+    def refund_client(self, client_id: str) -> None:
+        self._client_bucket(client_id).refund()
+
+
+# Refill and take one token atomically. Returns 0 when admitted, otherwise the
+# wait in milliseconds until a token is available.
+_REDIS_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) / rate * 1000)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return wait
+"""
+
+# Give back one token taken by _REDIS_BUCKET_SCRIPT, never exceeding capacity
+_REDIS_REFUND_SCRIPT = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens then
+    redis.call('HSET', KEYS[1], 'tokens', math.min(tonumber(ARGV[1]), tokens + 1))
+end
+return 0
+"""
+
+
+class RedisBucketStore:
+    """Same interface as MemoryBucketStore, shared across workers through Redis.
+    After a Redis error it uses per-process in-memory buckets for `cooldown`
+    seconds before trying Redis again."""
+
+    def __init__(
+        self, redis_url, global_rate, global_burst, client_rate, client_burst,
+        prefix="sweetswap:llm", socket_timeout: float = 0.25, cooldown: float = 30.0,
+    ):
+        import redis
+
+        self.errors = (redis.RedisError,)
+        self.client = redis.Redis.from_url(
+            redis_url, socket_connect_timeout=socket_timeout, socket_timeout=socket_timeout,
+        )
+        self.script = self.client.register_script(_REDIS_BUCKET_SCRIPT)
+        self.refund_script = self.client.register_script(_REDIS_REFUND_SCRIPT)
+        self.fallback = MemoryBucketStore(global_rate, global_burst, client_rate, client_burst)
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.prefix = prefix
+        self.cooldown = cooldown
+        self._down_until = 0.0
+
+    def _redis_down(self) -> bool:
+        return time.monotonic() < self._down_until
+
+    def _mark_down(self, e: Exception) -> None:
+        if not self._redis_down():
+            print(f"⚠️ Redis rate limiter unavailable, using in-memory buckets for {self.cooldown:.0f}s: {e}")
+        self._down_until = time.monotonic() + self.cooldown
+
+    def _take(self, key: str, rate: float, capacity: float, fallback) -> float:
+        if self._redis_down():
+            return fallback()
+        try:
+            wait_ms = self.script(keys=[key], args=[rate, capacity])
+        except self.errors as e:
+            self._mark_down(e)
+            return fallback()
+        return int(wait_ms) / 1000.0
+
+    def try_acquire_global(self) -> float:
+        return self._take(
+            f"{self.prefix}:global", self.global_rate, self.global_burst,
+            self.fallback.try_acquire_global,
+        )
+
+    def try_acquire_client(self, client_id: str) -> float:
+        return self._take(
+            f"{self.prefix}:client:{client_id}", self.client_rate, self.client_burst,
+            lambda: self.fallback.try_acquire_client(client_id),
+        )
+
+    def refund_client(self, client_id: str) -> None:
+        if self._redis_down():
+            self.fallback.refund_client(client_id)
+            return
+        try:
+            self.refund_script(keys=[f"{self.prefix}:client:{client_id}"], args=[self.client_burst])
+        except self.errors as e:
+            self._mark_down(e)
+            self.fallback.refund_client(client_id)
+
+
+class AdmissionController:
+    """Admits a request once both its client bucket and the global bucket have a
+    token, waiting at most `max_wait` seconds before shedding it."""
+
+    def __init__(self, store, max_wait: float):
+        self.store = store
+        self.max_wait = max_wait
+
+    def _acquire(self, take, deadline: float) -> bool:
+        while True:
+            wait = take()
+            if wait <= 0:
+                return True
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                return False
+            time.sleep(wait)
+
+    def admit(self, client_id: str | None = None) -> bool:
+        deadline = time.monotonic() + self.max_wait
+        if client_id and not self._acquire(lambda: self.store.try_acquire_client(client_id), deadline):
+            return False
+        if self._acquire(self.store.try_acquire_global, deadline):
+            return True
+        # Shed by the global limit: don't charge the client for a call that never happened
+        if client_id:
+            self.store.refund_client(client_id)
+        return False
+
+
+_controller: AdmissionController | None = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                settings = get_settings()
+                limits = (
+                    settings.llm_global_rate,
+                    settings.llm_global_burst,
+                    settings.llm_client_rate,
+                    settings.llm_client_burst,
+                )
+                if settings.rate_limit_backend == "redis":
+                    # Keep a dead Redis from eating the admission wait budget
+                    socket_timeout = min(0.25, settings.llm_admission_max_wait / 4)
+                    store = RedisBucketStore(settings.redis_url, *limits, socket_timeout=socket_timeout)
+                else:
+                    store = MemoryBucketStore(*limits)
+                _controller = AdmissionController(store, settings.llm_admission_max_wait)
+    return _controller
@@ -0,0 +1,115 @@
+"""
+Lightweight request event log for `/substitute`.
+
+Events are queued without blocking the request and a background thread
+flushes them in batches, either appended to a JSONL file or written as
+Parquet part files when the configured path ends in `.parquet`.
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+from ..config import get_settings
+
+
+def normalize_drink_name(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+class BufferedEventWriter:
+    def __init__(self, path: str, batch_size: int = 200, flush_interval: float = 2.0, max_queue: int = 10_000):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, event: dict) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # Never block the request path; losing a few events is acceptable
+            self.dropped += 1
+
+    def _drain(self, first: dict | None = None) -> list[dict]:
+        batch = [first] if first is not None else []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            self._flush(self._drain(first))
+        self._flush(self._drain())
+
+    def _flush(self, batch: list[dict]) -> None:
+        if not batch:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self.path.suffix == ".parquet":
+                import pandas as pd
+
+                self.path.mkdir(exist_ok=True)
+                part = self.path / f"part-{os.getpid()}-{time.time_ns()}.parquet"
+                # Write under a name readers don't glob, then rename atomically
+                tmp = part.with_name(f".{part.name}.tmp")
+                pd.DataFrame(batch).to_parquet(tmp, index=False)
+                os.replace(tmp, part)
+            else:
+                # One unbuffered O_APPEND write per batch so lines from several
+                # uvicorn workers appending to the same file don't interleave
+                data = "".join(json.dumps(event) + "\n" for event in batch).encode("utf-8")
+                with open(self.path, "ab", buffering=0) as f:
+                    f.write(data)
+        except Exception as e:
+            print(f"⚠️ Failed to flush {len(batch)} request events: {e}")
+
+    def close(self) -> None:
+        if not self._stop.is_set():
+            self._stop.set()
+            self._thread.join(timeout=5)
+
+
+_writer: BufferedEventWriter | None = None
+_writer_lock = threading.Lock()
+
+
+def get_event_writer() -> BufferedEventWriter | None:
+    global _writer
+    settings = get_settings()
+    if not settings.request_log_enabled:
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = BufferedEventWriter(settings.request_log_path)
+    return _writer
+
+
+def log_request_event(drink_name: str, hit: bool, latency_ms: float, source: str | None) -> None:
+    writer = get_event_writer()
+    if writer is None:
+        return
+    writer.write({
+        "ts": time.time(),
+        "drink": normalize_drink_name(drink_name),
+        "hit": hit,
+        "latency_ms": round(latency_ms, 2),
+        "source": source,
+    })
@@ -1,8 +1,13 @@
+import time
+from datetime import datetime, timezone
+
 from sqlalchemy.orm import Session
 
 from .. import models, schemas
+from ..database import use_primary
 from .llm import generate_substitution
 from .nutrition import enrich_nutrition_data
+from .request_log import log_request_event
 
 
 def find_existing_substitution(db: Session, drink_name: str) -> models.Substitution | None:
@@ -13,6 +18,9 @@ def find_existing_substitution(db: Session, drink_name: str) -> models.Substitut
     )
     if not drink:
         return None
+    if drink.current_substitution_id is not None:
+        return db.get(models.Substitution, drink.current_substitution_id)
+    # Drinks written before current_substitution_id existed; served by the composite index
     return (
         db.query(models.Substitution)
         .filter(models.Substitution.original_drink_id == drink.id)
@@ -27,6 +35,8 @@ def create_substitution_record(
     substitute_payload: dict,
     source: str,
 ) -> models.Substitution:
+    # A lagging replica could miss a drink the primary already has
+    use_primary(db)
     drink = (
         db.query(models.Drink)
         .filter(models.Drink.name.ilike(original_drink_name))
@@ -46,6 +56,8 @@ def create_substitution_record(
         source=source,
     )
     db.add(substitution)
+    db.flush()
+    drink.current_substitution_id = substitution.id
     db.commit()
     db.refresh(substitution)
     return substitution
@@ -54,14 +66,50 @@ def create_substitution_record(
 def get_or_create_substitution(
     db: Session,
     request: schemas.SubstituteRequest,
-) -> schemas.Substitution:
+    client_id: str | None = None,
+    fast: bool = False,
+) -> schemas.Substitution | schemas.SubstitutionRow:
+    """`fast=True` returns an unvalidated SubstitutionRow for the orjson response path."""
+    started = time.perf_counter()
+    serializer = schemas.SubstitutionRow if fast else schemas.Substitution
+    result, hit = _get_or_create_substitution(db, request, client_id, serializer)
+    log_request_event(
+        request.drink_name,
+        hit=hit,
+        latency_ms=(time.perf_counter() - started) * 1000,
+        source=result.source,
+    )
+    return result
+
+
+def _get_or_create_substitution(
+    db: Session,
+    request: schemas.SubstituteRequest,
+    client_id: str | None,
+    serializer,
+) -> tuple[schemas.Substitution | schemas.SubstitutionRow, bool]:
     existing = find_existing_substitution(db, request.drink_name)
+    if existing is None and use_primary(db):
+        # Confirm a replica miss on the primary before paying for an LLM call
+        existing = find_existing_substitution(db, request.drink_name)
     if existing:
         # Use custom serializer to include original_drink_name
-        return schemas.Substitution.from_orm(existing)
+        return serializer.from_orm(existing), True
 
     nutrition = enrich_nutrition_data(request.drink_name) if request.include_nutrition else {}
-    llm_payload = generate_substitution(request.drink_name, nutrition=nutrition)
+    llm_payload = generate_substitution(request.drink_name, nutrition=nutrition, client_id=client_id)
+    if not llm_payload.get("persist", True):
+        # Shed or failed LLM call: answer now but don't store, so it is regenerated later
+        return serializer(
+            substitute_name=llm_payload["name"],
+            substitute_notes=llm_payload.get("notes"),
+            original_drink_name=request.drink_name,
+            sugar_delta=llm_payload.get("sugar_delta"),
+            caffeine_delta=llm_payload.get("caffeine_delta"),
+            source="fallback",
+            created_at=datetime.now(timezone.utc),
+            persisted=False,
+        ), False
     record = create_substitution_record(
         db,
         original_drink_name=request.drink_name,
@@ -70,5 +118,5 @@ def get_or_create_substitution(
     )
     # Reload to get relationships
     db.refresh(record)
-    return schemas.Substitution.from_orm(record)
+    return serializer.from_orm(record), False
 
@@ -0,0 +1,44 @@
+"""
+Redis queue consumers for LLM generation jobs (LLM_WORKER_BACKEND=redis).
+Run with: python -m backend.app.worker --processes 4
+
+Each consumer runs in its own process; the supervisor restarts any that exit,
+so a crashed SDK call only costs the job it was working on.
+"""
+import argparse
+import multiprocessing
+import time
+
+from .config import get_settings
+from .services.llm_worker import consume_jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run LLM generation queue consumers")
+    parser.add_argument("--processes", type=int, default=get_settings().llm_worker_processes)
+    args = parser.parse_args()
+
+    redis_url = get_settings().redis_url
+    ctx = multiprocessing.get_context("spawn")
+
+    def start(slot: int):
+        process = ctx.Process(target=consume_jobs, args=(redis_url,), name=f"llm-worker-{slot}", daemon=True)
+        process.start()
+        return process
+
+    workers = [start(slot) for slot in range(args.processes)]
+    print(f"✅ Started {len(workers)} LLM workers consuming from Redis")
+    try:
+        while True:
+            for slot, process in enumerate(workers):
+                if not process.is_alive():
+                    print(f"⚠️ {process.name} exited with code {process.exitcode}, restarting")
+                    workers[slot] = start(slot)
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for process in workers:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Microbenchmark: per-request CPU of the default vs FAST_RESPONSES serialization path.
+Run with: python backend/benchmarks/serialization.py [--requests 20000] [--concurrency 64]
+
+Default path: schemas.Substitution.from_orm (validation), re-validation against
+response_model, jsonable encoding and stdlib json.
+Fast path: schemas.SubstitutionRow.from_orm encoded with orjson into a Response.
+Both run against an in-memory ORM-like row so only serialization is measured.
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import orjson
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from backend.app import schemas
+
+ROW = SimpleNamespace(
+    id=42,
+    substitute_name="Mango Green Tea w/ Stevia",
+    substitute_notes="Same fruity flavor profile with 80% less sugar. Ask for green tea base with sugar-free mango syrup.",
+    original_drink=SimpleNamespace(name="Mango Boba Tea"),
+    sugar_delta=-30.0,
+    caffeine_delta=-20.0,
+    source="manual",
+    created_at=datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc),
+)
+
+response_model = TypeAdapter(schemas.Substitution)
+
+
+def default_path() -> bytes:
+    result = schemas.Substitution.from_orm(ROW)
+    # FastAPI validates the returned object against response_model, then encodes it
+    validated = response_model.validate_python(result.model_dump())
+    content = jsonable_encoder(validated)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path() -> bytes:
+    row = schemas.SubstitutionRow.from_orm(ROW)
+    return Response(orjson.dumps(row, option=orjson.OPT_UTC_Z), media_type="application/json").body
+
+
+def measure(fn, requests: int, concurrency: int) -> tuple[float, float]:
+    """Return (CPU microseconds per request, requests per second)."""
+    fn()  # warm up
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in pool.map(lambda _: fn(), range(requests)):
+            pass
+    cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+    return cpu / requests * 1e6, requests / wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare substitution response serialization paths")
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests, {args.concurrency} threads")
+    results = {}
+    for name, fn in (("default", default_path), ("fast", fast_path)):
+        cpu_us, rps = measure(fn, args.requests, args.concurrency)
+        results[name] = cpu_us
+        print(f"   {name:<8} {cpu_us:8.1f} µs CPU/request   {rps:10.0f} req/s")
+    print(f"   speedup  {results['default'] / results['fast']:.1f}x CPU per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ Run with: streamlit run frontend/app.py
 """
 import streamlit as st
 import requests
+import threading
+from collections import OrderedDict
 from typing import Optional
 
 # Color palette
@@ -72,16 +74,50 @@ st.markdown(
 )
 
 
+RESPONSE_CACHE_SIZE = 300
+
+
+@st.cache_resource
+def get_response_cache() -> OrderedDict:
+    """LRU of ETag + body per lookup, shared by all sessions and kept across reruns."""
+    return OrderedDict()
+
+
+@st.cache_resource
+def get_response_cache_lock() -> threading.Lock:
+    return threading.Lock()
+
+
+def remember_response(cache: OrderedDict, key: tuple, entry: dict) -> None:
+    # Every Streamlit session runs in its own thread against the same cache
+    with get_response_cache_lock():
+        cache[key] = entry
+        cache.move_to_end(key)
+        while len(cache) > RESPONSE_CACHE_SIZE:
+            cache.popitem(last=False)
+
+
 def call_api(drink_name: str, include_nutrition: bool = True) -> Optional[dict]:
-    """Call the FastAPI /substitute endpoint."""
+    """Call the cacheable FastAPI GET /substitute endpoint."""
+    cache = get_response_cache()
+    key = (drink_name.strip().lower(), include_nutrition)
+    cached = cache.get(key)
     try:
-        response = requests.post(
+        response = requests.get(
             f"{API_BASE_URL}/substitute",
-            json={"drink_name": drink_name, "include_nutrition": include_nutrition},
+            params={"drink_name": drink_name, "include_nutrition": include_nutrition},
+            headers={"If-None-Match": cached["etag"]} if cached else {},
             timeout=10,
         )
+        if response.status_code == 304 and cached:
+            remember_response(cache, key, cached)
+            return cached["body"]
         response.raise_for_status()
-        return response.json()
+        body = response.json()
+        etag = response.headers.get("ETag")
+        if etag:
+            remember_response(cache, key, {"etag": etag, "body": body})
+        return body
     except requests.exceptions.ConnectionError:
         st.error("❌ Could not connect to backend API. Make sure FastAPI is running on http://localhost:8000")
         return None
@@ -0,0 +1,300 @@
+"""
+Concurrent, incremental cafe menu scraper.
+Run with: python scrapers/menu_scraper.py [--targets scrapers/targets.json] [--no-db]
+
+Fetches every menu in targets.json with aiohttp (bounded connections and a
+minimum delay per host), skips menus that are unchanged via ETag/Last-Modified
+and a content hash, parses HTML in a process pool with lxml and streams the
+drinks into data/raw/{source}.csv and a bulk upsert of the drinks table.
+Each target's parsed rows are kept under data/raw/{source}/ so a source's CSV
+can be rebuilt when only some of its menus changed.
+"""
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import aiohttp
+from lxml import html as lxml_html
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+RAW_DIR = project_root / "data" / "raw"
+STATE_PATH = project_root / "data" / "raw" / ".scrape_state.json"
+CSV_FIELDS = ["name", "category", "ingredients", "sugar_content", "caffeine_content", "flavor_profile", "source"]
+
+SUGAR_RE = re.compile(r"(\d+(?:\.\d+)?)\s*g(?:rams)?\s+(?:of\s+)?sugars?", re.IGNORECASE)
+CAFFEINE_RE = re.compile(r"(\d+(?:\.\d+)?)\s*mg\s+(?:of\s+)?caffeine", re.IGNORECASE)
+
+
+def parse_menu(page: str, target: dict) -> list[dict]:
+    """Extract drink rows from a menu page. Runs in a worker process."""
+    tree = lxml_html.fromstring(page)
+    drinks = []
+    for item in tree.xpath(target.get("item_xpath", "//li")):
+        names = item.xpath(target.get("name_xpath", ".//h3"))
+        if not names:
+            continue
+        name = " ".join(names[0].text_content().split())
+        if not name:
+            continue
+        descriptions = item.xpath(target.get("description_xpath", ".//p"))
+        description = " ".join(descriptions[0].text_content().split()) if descriptions else None
+        sugar = SUGAR_RE.search(description or "")
+        caffeine = CAFFEINE_RE.search(description or "")
+        drinks.append({
+            "name": name,
+            "category": target.get("category"),
+            "ingredients": description,
+            "sugar_content": float(sugar.group(1)) if sugar else None,
+            "caffeine_content": float(caffeine.group(1)) if caffeine else None,
+            "flavor_profile": None,
+            "source": target["source"],
+        })
+    return drinks
+
+
+class HostLimiter:
+    """Caps concurrent requests per host and spaces them by `delay` seconds."""
+
+    def __init__(self, per_host: int, delay: float):
+        self.delay = delay
+        self._semaphores = defaultdict(lambda: asyncio.Semaphore(per_host))
+        self._locks = defaultdict(asyncio.Lock)
+        self._last_request: dict[str, float] = {}
+
+    async def wait(self, host: str) -> None:
+        async with self._locks[host]:
+            elapsed = time.monotonic() - self._last_request.get(host, 0.0)
+            if elapsed < self.delay:
+                await asyncio.sleep(self.delay - elapsed)
+            self._last_request[host] = time.monotonic()
+
+    def slot(self, host: str) -> asyncio.Semaphore:
+        return self._semaphores[host]
+
+
+def target_rows_path(target: dict) -> Path:
+    url_key = hashlib.sha256(target["url"].encode("utf-8")).hexdigest()[:16]
+    return RAW_DIR / target["source"] / f"{url_key}.json"
+
+
+def load_target_rows(target: dict) -> list[dict] | None:
+    path = target_rows_path(target)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_target_rows(target: dict, rows: list[dict]) -> None:
+    path = target_rows_path(target)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(rows), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def load_state() -> dict:
+    if STATE_PATH.exists():
+        return json.loads(STATE_PATH.read_text(encoding="utf-8"))
+    return {}
+
+
+def save_state(state: dict) -> None:
+    STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    STATE_PATH.write_text(json.dumps(state, indent=2), encoding="utf-8")
+
+
+async def fetch(session: aiohttp.ClientSession, limiter: HostLimiter, target: dict, state: dict):
+    """Return (status, body, state_entry) with status "changed", "unchanged" or "failed".
+    The caller stores state_entry only once the body has been parsed successfully."""
+    url = target["url"]
+    host = urlsplit(url).netloc
+    previous = state.get(url, {})
+    headers = {}
+    if previous.get("etag"):
+        headers["If-None-Match"] = previous["etag"]
+    if previous.get("last_modified"):
+        headers["If-Modified-Since"] = previous["last_modified"]
+
+    async with limiter.slot(host):
+        await limiter.wait(host)
+        try:
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304:
+                    return "unchanged", None, previous
+                response.raise_for_status()
+                body = await response.text()
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"⚠️ Failed to fetch {url}: {e}")
+            return "failed", None, previous
+
+    content_hash = hashlib.sha256(body.encode("utf-8")).hexdigest()
+    entry = {"etag": etag, "last_modified": last_modified, "hash": content_hash}
+    if previous.get("hash") == content_hash:
+        return "unchanged", None, entry
+    return "changed", body, entry
+
+
+def upsert_drinks(rows: list[dict]) -> None:
+    """Bulk upsert into drinks by name; scraped nulls never overwrite known values."""
+    from sqlalchemy import func
+    from sqlalchemy.dialects.postgresql import insert
+
+    from backend.app import models
+    from backend.app.database import SessionLocal
+
+    # Postgres rejects duplicate conflict keys within one statement
+    rows = list({row["name"]: row for row in rows}.values())
+    stmt = insert(models.Drink).values(rows)
+    table = models.Drink.__table__
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.name],
+        set_={
+            column: func.coalesce(stmt.excluded[column], table.c[column])
+            for column in CSV_FIELDS
+            if column != "name"
+        },
+    )
+    db = SessionLocal(info={"use_primary": True})
+    try:
+        db.execute(stmt)
+        db.commit()
+    finally:
+        db.close()
+
+
+def write_source_csv(source: str, parsed: list[list[dict]]) -> None:
+    path = RAW_DIR / f"{source}.csv"
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for target_rows in parsed:
+            writer.writerows(target_rows)
+    os.replace(tmp, path)
+
+
+async def write_rows(queue: asyncio.Queue, targets_per_source: dict[str, int], write_db: bool, batch_size: int) -> int:
+    """Consume (position, target, rows) per target; rows is None when the target was unchanged or failed.
+
+    Fresh rows are saved per target and upserted as they arrive. Once every
+    target of a source has reported, data/raw/{source}.csv is rebuilt from the
+    fresh rows of changed targets and the saved rows of the others."""
+    RAW_DIR.mkdir(parents=True, exist_ok=True)
+    pending: list[dict] = []
+    by_source: dict[str, list] = defaultdict(list)
+    total = 0
+    while True:
+        item = await queue.get()
+        if item is None:
+            break
+        position, target, rows = item
+        source = target["source"]
+        if rows is not None:
+            await asyncio.to_thread(save_target_rows, target, rows)
+        by_source[source].append((position, target, rows))
+        if len(by_source[source]) == targets_per_source[source]:
+            # Write in targets.json order, not completion order
+            reported = sorted(by_source.pop(source), key=lambda entry: entry[0])
+            changed = any(target_rows is not None for _, _, target_rows in reported)
+            if changed or not (RAW_DIR / f"{source}.csv").exists():
+                parsed = [
+                    target_rows if target_rows is not None else load_target_rows(source_target)
+                    for _, source_target, target_rows in reported
+                ]
+                # A target that never parsed has no rows to contribute yet
+                if any(target_rows is not None for target_rows in parsed):
+                    await asyncio.to_thread(write_source_csv, source, [target_rows or [] for target_rows in parsed])
+        if not rows:
+            continue
+        total += len(rows)
+        if write_db:
+            pending.extend(rows)
+            if len(pending) >= batch_size:
+                await asyncio.to_thread(upsert_drinks, pending)
+                pending = []
+    if write_db and pending:
+        await asyncio.to_thread(upsert_drinks, pending)
+    return total
+
+
+async def scrape(targets: list[dict], args) -> dict:
+    state = load_state()
+    limiter = HostLimiter(args.per_host, args.delay)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+    targets_per_source: dict[str, int] = defaultdict(int)
+    for target in targets:
+        targets_per_source[target["source"]] += 1
+    writer = asyncio.create_task(write_rows(queue, targets_per_source, not args.no_db, args.batch_size))
+    loop = asyncio.get_running_loop()
+    counts = {"changed": 0, "unchanged": 0, "failed": 0}
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency, limit_per_host=args.per_host)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    headers = {"User-Agent": "SweetSwapAI-menu-scraper/1.0"}
+    # spawn rather than fork: the event loop and aiohttp resolver run threads
+    with ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn")) as parsers:
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+
+            async def process(position: int, target: dict) -> None:
+                # One bad page (e.g. lxml ParserError on an empty body) must not abort the run
+                rows = None
+                # Without saved rows a 304 would leave nothing to rebuild the CSV from
+                known = state if target_rows_path(target).exists() else {}
+                try:
+                    status, page, entry = await fetch(session, limiter, target, known)
+                    if status == "changed":
+                        rows = await loop.run_in_executor(parsers, parse_menu, page, target)
+                except Exception as e:
+                    print(f"⚠️ Failed to scrape {target['url']}: {type(e).__name__}: {e}")
+                    status, rows = "failed", None
+                # State is only advanced after a successful parse, so failures are retried next run
+                if status != "failed":
+                    state[target["url"]] = entry
+                counts[status] += 1
+                await queue.put((position, target, rows))
+
+            await asyncio.gather(*(process(position, target) for position, target in enumerate(targets)))
+
+    await queue.put(None)
+    total = await writer
+    save_state(state)
+    print(
+        f"✅ Scraped {counts['changed']} changed menus "
+        f"({counts['unchanged']} unchanged, {counts['failed']} failed), {total} drinks"
+    )
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape cafe menus into the drinks catalog")
+    parser.add_argument("--targets", default=str(Path(__file__).parent / "targets.json"))
+    parser.add_argument("--concurrency", type=int, default=50, help="total open connections")
+    parser.add_argument("--per-host", type=int, default=2, help="concurrent requests per host")
+    parser.add_argument("--delay", type=float, default=1.0, help="minimum seconds between requests to a host")
+    parser.add_argument("--timeout", type=float, default=20.0)
+    parser.add_argument("--batch-size", type=int, default=500, help="rows per bulk upsert")
+    parser.add_argument("--no-db", action="store_true", help="only write data/raw CSVs")
+    args = parser.parse_args()
+
+    targets = json.loads(Path(args.targets).read_text(encoding="utf-8"))
+    asyncio.run(scrape(targets, args))
+
+
+if __name__ == "__main__":
+    main()
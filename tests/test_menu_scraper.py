@@ -0,0 +1,230 @@
+"""
+Tests for scrapers/menu_scraper.py against menus served by a local aiohttp server.
+"""
+import asyncio
+import csv
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from scrapers import menu_scraper  # noqa: E402
+
+FIXTURES = Path(__file__).parent / "fixtures" / "menus"
+
+TARGET_XPATHS = {
+    "item_xpath": "//*[contains(@class, 'menu-item')]",
+    "name_xpath": ".//h3",
+    "description_xpath": ".//p",
+}
+
+
+class MenuServer:
+    """Serves fixture pages; tracks requests, conditional headers and concurrency."""
+
+    def __init__(self, use_etag: bool = True, delay: float = 0.0):
+        self.pages = {path.stem: path.read_text(encoding="utf-8") for path in FIXTURES.glob("*.html")}
+        self.pages["empty"] = ""
+        self.use_etag = use_etag
+        self.delay = delay
+        self.requests: list[dict] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            self.requests.append({"path": request.path, "at": time.monotonic(), "headers": dict(request.headers)})
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            name = request.match_info["name"]
+            body = self.pages[name]
+            headers = {}
+            if self.use_etag:
+                etag = f'"{name}-{len(body)}"'
+                headers["ETag"] = etag
+                if request.headers.get("If-None-Match") == etag:
+                    return web.Response(status=304, headers=headers)
+            return web.Response(text=body, content_type="text/html", headers=headers)
+        finally:
+            self.in_flight -= 1
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get("/menu/{name}", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        return f"http://127.0.0.1:{port}"
+
+    async def stop(self) -> None:
+        await self.runner.cleanup()
+
+
+def make_target(base_url: str, name: str, source: str) -> dict:
+    return {"source": source, "url": f"{base_url}/menu/{name}", "category": "Coffee", **TARGET_XPATHS}
+
+
+def make_args(**overrides) -> SimpleNamespace:
+    args = {"per_host": 2, "delay": 0.0, "concurrency": 10, "timeout": 5.0, "batch_size": 500, "no_db": True}
+    args.update(overrides)
+    return SimpleNamespace(**args)
+
+
+@pytest.fixture
+def scrape_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(menu_scraper, "RAW_DIR", tmp_path / "raw")
+    monkeypatch.setattr(menu_scraper, "STATE_PATH", tmp_path / "raw" / ".scrape_state.json")
+    return tmp_path / "raw"
+
+
+async def fetch_twice(server: MenuServer, name: str):
+    base_url = await server.start()
+    try:
+        target = make_target(base_url, name, "bean_bar")
+        limiter = menu_scraper.HostLimiter(per_host=2, delay=0.0)
+        state: dict = {}
+        async with aiohttp.ClientSession() as session:
+            first = await menu_scraper.fetch(session, limiter, target, state)
+            state[target["url"]] = first[2]
+            second = await menu_scraper.fetch(session, limiter, target, state)
+        return first, second
+    finally:
+        await server.stop()
+
+
+def test_parse_menu_extracts_names_and_nutrition_clues():
+    page = (FIXTURES / "bean_bar.html").read_text(encoding="utf-8")
+    rows = menu_scraper.parse_menu(page, {"source": "bean_bar", "category": "Coffee", **TARGET_XPATHS})
+
+    assert [row["name"] for row in rows] == ["Caramel Latte", "Iced Green Tea", "Hot Chocolate"]
+    assert rows[0]["sugar_content"] == 32.0
+    assert rows[0]["caffeine_content"] == 150.0
+    assert rows[1]["sugar_content"] == 0.0
+    assert rows[1]["caffeine_content"] == 25.0
+    assert rows[2]["ingredients"] is None
+    assert all(row["source"] == "bean_bar" and row["category"] == "Coffee" for row in rows)
+
+
+def test_etag_revalidation_skips_unchanged_menu():
+    server = MenuServer(use_etag=True)
+    first, second = asyncio.run(fetch_twice(server, "bean_bar"))
+
+    assert first[0] == "changed"
+    assert "Caramel" in first[1]
+    assert second[0] == "unchanged"
+    assert second[1] is None
+    assert server.requests[1]["headers"]["If-None-Match"] == first[2]["etag"]
+
+
+def test_content_hash_skips_unchanged_menu_without_validators():
+    server = MenuServer(use_etag=False)
+    first, second = asyncio.run(fetch_twice(server, "bean_bar"))
+
+    assert first[0] == "changed"
+    assert "If-None-Match" not in server.requests[1]["headers"]
+    assert second == ("unchanged", None, first[2])
+
+
+def test_host_limiter_caps_concurrency_and_spaces_requests():
+    async def run(server: MenuServer, per_host: int, delay: float, count: int):
+        base_url = await server.start()
+        try:
+            limiter = menu_scraper.HostLimiter(per_host=per_host, delay=delay)
+            async with aiohttp.ClientSession() as session:
+                await asyncio.gather(*(
+                    menu_scraper.fetch(session, limiter, make_target(base_url, "tea_house", "tea"), {})
+                    for _ in range(count)
+                ))
+        finally:
+            await server.stop()
+
+    concurrent = MenuServer(delay=0.05)
+    asyncio.run(run(concurrent, per_host=2, delay=0.0, count=6))
+    assert len(concurrent.requests) == 6
+    assert concurrent.max_in_flight == 2
+
+    spaced = MenuServer()
+    asyncio.run(run(spaced, per_host=5, delay=0.1, count=3))
+    starts = sorted(request["at"] for request in spaced.requests)
+    assert all(later - earlier >= 0.09 for earlier, later in zip(starts, starts[1:]))
+
+
+def test_scrape_survives_bad_pages_and_keeps_multi_target_csv_complete(scrape_dirs):
+    server = MenuServer()
+
+    async def run(targets):
+        return await menu_scraper.scrape(targets, make_args())
+
+    async def scenario():
+        base_url = await server.start()
+        try:
+            targets = [
+                make_target(base_url, "bean_bar", "cafe"),
+                make_target(base_url, "tea_house", "cafe"),
+                make_target(base_url, "empty", "broken"),
+            ]
+            first = await run(targets)
+            # Second run: cafe menus answer 304, the empty page fails again
+            second = await run(targets)
+            return targets, first, second
+        finally:
+            await server.stop()
+
+    targets, first, second = asyncio.run(scenario())
+
+    assert first == {"changed": 2, "unchanged": 0, "failed": 1}
+    assert second == {"changed": 0, "unchanged": 2, "failed": 1}
+
+    with open(scrape_dirs / "cafe.csv", newline="", encoding="utf-8") as f:
+        names = [row["name"] for row in csv.DictReader(f)]
+    assert names == ["Caramel Latte", "Iced Green Tea", "Hot Chocolate", "Mango Boba Tea"]
+    assert not (scrape_dirs / "broken.csv").exists()
+
+    state = menu_scraper.load_state()
+    assert targets[0]["url"] in state and targets[1]["url"] in state
+    # Failed pages don't advance state, so they are retried next run
+    assert targets[2]["url"] not in state
+
+
+def test_partial_refresh_rebuilds_csv_from_saved_target_rows(scrape_dirs):
+    server = MenuServer()
+    bean_bar, tea_house = server.pages["bean_bar"], server.pages["tea_house"]
+
+    def csv_names() -> list[str]:
+        with open(scrape_dirs / "cafe.csv", newline="", encoding="utf-8") as f:
+            return [row["name"] for row in csv.DictReader(f)]
+
+    async def scenario():
+        base_url = await server.start()
+        try:
+            targets = [make_target(base_url, "bean_bar", "cafe"), make_target(base_url, "tea_house", "cafe")]
+            await menu_scraper.scrape(targets, make_args())
+            # Only the second menu changes: the first answers 304 and comes from its saved rows
+            server.pages["tea_house"] = tea_house.replace("Mango Boba Tea", "Taro Milk Tea")
+            refreshed = await menu_scraper.scrape(targets, make_args())
+            names_after_refresh = csv_names()
+            # A menu that fails keeps contributing its last parsed rows when another one changes
+            server.pages["bean_bar"] = bean_bar.replace("Hot Chocolate", "Cold Brew")
+            server.pages["tea_house"] = ""
+            failed = await menu_scraper.scrape(targets, make_args())
+            return refreshed, names_after_refresh, failed
+        finally:
+            await server.stop()
+
+    refreshed, names_after_refresh, failed = asyncio.run(scenario())
+
+    assert refreshed == {"changed": 1, "unchanged": 1, "failed": 0}
+    assert names_after_refresh == ["Caramel Latte", "Iced Green Tea", "Hot Chocolate", "Taro Milk Tea"]
+    assert failed == {"changed": 1, "unchanged": 0, "failed": 1}
+    assert csv_names() == ["Caramel Latte", "Iced Green Tea", "Cold Brew", "Taro Milk Tea"]